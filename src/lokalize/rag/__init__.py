@@ -4,15 +4,55 @@ Combines web scraping with AWS Bedrock Knowledge Base
 """
 import logging
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 
+from langchain.schema import Document
+
 from .web_scraper import FashionCulturalScraper, get_saudi_fashion_cultural_data
 from .query_engine import BedrockKnowledgeBase
+from .local_retriever import LocalRetriever
+from .semantic_cache import SemanticCache
+
+try:
+    import ahocorasick
+except ImportError:  # Optional: a compiled regex is used instead
+    ahocorasick = None
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Keywords in generated advice mapped to the response field they signal
+RESPONSE_KEYWORDS = {
+    "cultural": "cultural_insights",
+    "recommend": "recommendations",
+}
+
+if ahocorasick is not None:
+    _KEYWORD_AUTOMATON = ahocorasick.Automaton()
+    for _keyword, _field in RESPONSE_KEYWORDS.items():
+        _KEYWORD_AUTOMATON.add_word(_keyword, _field)
+    _KEYWORD_AUTOMATON.make_automaton()
+else:
+    _KEYWORD_PATTERN = re.compile("|".join(map(re.escape, RESPONSE_KEYWORDS)), re.IGNORECASE)
+
+def _match_keyword_fields(text: str) -> set:
+    """Find which response fields are signalled by keywords, in one pass over the text"""
+    if ahocorasick is not None:
+        matches = (field for _, field in _KEYWORD_AUTOMATON.iter(text.casefold()))
+    else:
+        matches = (RESPONSE_KEYWORDS[m.group().lower()] for m in _KEYWORD_PATTERN.finditer(text))
+    
+    fields = set()
+    for field in matches:
+        fields.add(field)
+        if len(fields) == len(RESPONSE_KEYWORDS):
+            break
+    return fields
+
+@dataclass(slots=True, frozen=True)
 class LocalizationRequest:
     """Request for fashion localization advice"""
     query: str
@@ -21,7 +61,7 @@ class LocalizationRequest:
     product_type: Optional[str] = None
     campaign_type: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True)
 class LocalizationResponse:
     """Response with localization advice"""
     query: str
@@ -40,7 +80,9 @@ class FashionLocalizationRAG:
     def __init__(self, 
                  knowledge_base_id: Optional[str] = None,
                  aws_region: str = "us-east-1",
-                 model_id: str = "anthropic.claude-3-sonnet-20240229-v1:0"):
+                 model_id: str = "anthropic.claude-3-sonnet-20240229-v1:0",
+                 semantic_cache: Optional[SemanticCache] = None,
+                 use_fused_pipeline: bool = True):
         """
         Initialize the Fashion Localization RAG system
         
@@ -48,10 +90,16 @@ class FashionLocalizationRAG:
             knowledge_base_id: AWS Bedrock Knowledge Base ID
             aws_region: AWS region for Bedrock
             model_id: Foundation model ID
+            semantic_cache: Optional semantic response cache for repeated queries;
+                a persistent cache is flushed by close() (and at interpreter exit)
+            use_fused_pipeline: Retrieve and generate in one Bedrock call; set to
+                False to keep the two-step pipeline's confidence threshold
         """
         self.knowledge_base_id = knowledge_base_id
         self.aws_region = aws_region
         self.model_id = model_id
+        self.use_fused_pipeline = use_fused_pipeline
+        self.semantic_cache = semantic_cache
         
         # Initialize components
         self.scraper = FashionCulturalScraper(chunk_size=800, chunk_overlap=100)
@@ -60,12 +108,24 @@ class FashionLocalizationRAG:
             self.query_engine = BedrockKnowledgeBase(
                 region_name=aws_region,
                 knowledge_base_id=knowledge_base_id,
-                model_id=model_id
+                model_id=model_id,
+                semantic_cache=semantic_cache
             )
         else:
             self.query_engine = None
             logger.warning("No Knowledge Base ID provided. Some features will be limited.")
     
+    def close(self) -> None:
+        """Persist the semantic cache, if one is configured"""
+        if self.semantic_cache is not None:
+            self.semantic_cache.close()
+    
+    def __enter__(self) -> "FashionLocalizationRAG":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
     def update_knowledge_base(self, urls: List[str]) -> Dict[str, Any]:
         """
         Scrape new URLs and update the knowledge base
@@ -99,6 +159,37 @@ class FashionLocalizationRAG:
             logger.error(f"Error updating knowledge base: {e}")
             return {"status": "error", "message": str(e)}
     
+    def build_local_retriever(self, 
+                              documents: List[Document],
+                              path: Optional[str] = None) -> LocalRetriever:
+        """
+        Index scraped chunks locally so hot queries skip the Bedrock Retrieve call
+        
+        Args:
+            documents: Chunked documents (e.g. from update_knowledge_base)
+            path: Optional file prefix to persist the index to
+            
+        Returns:
+            The local retriever, also attached to the query engine if configured
+        """
+        if not documents:
+            raise ValueError("No documents to index")
+        
+        embeddings = self.scraper.embed_documents(documents, region_name=self.aws_region)
+        retriever = LocalRetriever.from_documents(
+            documents,
+            embeddings,
+            embed_query=partial(self.scraper.embed_query, region_name=self.aws_region)
+        )
+        
+        if path:
+            retriever.save(path)
+        
+        if self.query_engine:
+            self.query_engine.local_retriever = retriever
+        
+        return retriever
+    
     def get_localization_advice(self, request: LocalizationRequest) -> LocalizationResponse:
         """
         Get culturally aware fashion localization advice
@@ -124,11 +215,17 @@ class FashionLocalizationRAG:
             # Enhance query with context
             enhanced_query = self._enhance_query(request)
             
-            # Query knowledge base and generate response
-            result = self.query_engine.query_and_generate(
-                enhanced_query, 
-                request.target_region
-            )
+            # The fused round trip skips the retrieval confidence threshold
+            if self.use_fused_pipeline:
+                result = self.query_engine.query_and_generate_fused(
+                    enhanced_query, 
+                    request.target_region
+                )
+            else:
+                result = self.query_engine.query_and_generate(
+                    enhanced_query, 
+                    request.target_region
+                )
             
             # Parse and structure the response
             return self._parse_response(request, result)
@@ -145,6 +242,29 @@ class FashionLocalizationRAG:
                 confidence_score=0.0
             )
     
+    def get_localization_advice_batch(self, 
+                                      requests: List[LocalizationRequest],
+                                      max_workers: int = 16) -> List[LocalizationResponse]:
+        """
+        Get localization advice for many requests concurrently
+        
+        Bedrock calls are I/O-bound, so threads overlap their latency. The shared
+        Bedrock clients pool up to 50 connections (BEDROCK_CLIENT_CONFIG), so
+        max_workers beyond that will queue on the pool.
+        
+        Args:
+            requests: Localization requests to process
+            max_workers: Maximum number of concurrent requests
+            
+        Returns:
+            Localization responses in the same order as the requests
+        """
+        if not requests:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(requests))) as executor:
+            return list(executor.map(self.get_localization_advice, requests))
+    
     def _enhance_query(self, request: LocalizationRequest) -> str:
         """Enhance query with additional context"""
         enhanced_parts = [request.query]
@@ -169,11 +289,12 @@ class FashionLocalizationRAG:
         # Extract insights and recommendations (simple parsing for hackathon)
         cultural_insights = []
         recommendations = []
+        matched_fields = _match_keyword_fields(advice)
         
-        if "cultural" in advice.lower():
+        if "cultural_insights" in matched_fields:
             cultural_insights.append("Cultural considerations identified in response")
         
-        if "recommend" in advice.lower():
+        if "recommendations" in matched_fields:
             recommendations.append("Specific recommendations provided")
         
         return LocalizationResponse(
@@ -186,6 +307,22 @@ class FashionLocalizationRAG:
             confidence_score=0.8  # Placeholder for hackathon
         )
 
+# Reused FashionLocalizationRAG instances keyed on (kb_id, region, model)
+_RAG_SINGLETON: Dict[tuple, FashionLocalizationRAG] = {}
+
+def _get_rag(knowledge_base_id: str,
+             aws_region: str = "us-east-1",
+             model_id: str = "anthropic.claude-3-sonnet-20240229-v1:0") -> FashionLocalizationRAG:
+    """Get a shared RAG instance so repeated quick calls skip client setup"""
+    key = (knowledge_base_id, aws_region, model_id)
+    if key not in _RAG_SINGLETON:
+        _RAG_SINGLETON[key] = FashionLocalizationRAG(
+            knowledge_base_id=knowledge_base_id,
+            aws_region=aws_region,
+            model_id=model_id
+        )
+    return _RAG_SINGLETON[key]
+
 # Convenience functions for quick testing
 def quick_localization_advice(query: str, 
                             knowledge_base_id: str,
@@ -201,7 +338,7 @@ def quick_localization_advice(query: str,
     Returns:
         Localization advice
     """
-    rag = FashionLocalizationRAG(knowledge_base_id=knowledge_base_id)
+    rag = _get_rag(knowledge_base_id)
     request = LocalizationRequest(query=query, target_region=target_region)
     response = rag.get_localization_advice(request)
     return response.advice
@@ -0,0 +1,43 @@
+"""
+Shared AWS Bedrock clients and JSON helpers for the RAG modules
+"""
+import json
+from functools import lru_cache
+from typing import Any
+import boto3
+from botocore.config import Config
+
+try:
+    import orjson
+except ImportError:  # Optional: stdlib json is used instead
+    orjson = None
+
+# Larger connection pool (botocore default is 10) so concurrent queries don't
+# serialize onto a few sockets; adaptive retries back off on throttling
+BEDROCK_CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={"mode": "adaptive", "max_attempts": 5},
+    tcp_keepalive=True,
+    read_timeout=60,
+    connect_timeout=5,
+)
+
+# boto3 client construction loads service models and resolves credentials,
+# so clients are built once per region and shared (they are thread-safe)
+@lru_cache(maxsize=8)
+def agent_client(region_name: str):
+    """Shared bedrock-agent-runtime client for a region"""
+    return boto3.client('bedrock-agent-runtime', region_name=region_name, config=BEDROCK_CLIENT_CONFIG)
+
+@lru_cache(maxsize=8)
+def runtime_client(region_name: str):
+    """Shared bedrock-runtime client for a region"""
+    return boto3.client('bedrock-runtime', region_name=region_name, config=BEDROCK_CLIENT_CONFIG)
+
+def json_dumps(obj: Any):
+    """Serialize a request body (boto3 accepts both bytes and str)"""
+    return orjson.dumps(obj) if orjson is not None else json.dumps(obj)
+
+def json_loads(data: Any) -> Any:
+    """Parse a Bedrock JSON payload from bytes or str"""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
@@ -0,0 +1,165 @@
+"""
+In-process HNSW retriever over scraped fashion cultural chunks
+"""
+import logging
+import os
+import pickle
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from langchain.schema import Document
+
+try:
+    import hnswlib
+except ImportError:  # Optional: install with `pip install lokalize[cache]`
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+class LocalRetriever:
+    """
+    Local vector index serving retrieval without a Bedrock Retrieve call.
+
+    Results use the same shape as Bedrock retrievalResults, so they can be
+    passed straight to BedrockKnowledgeBase.generate_culturally_aware_response.
+    """
+
+    def __init__(self,
+                 embed_query: Callable[[str], np.ndarray],
+                 dim: int,
+                 max_elements: int = 10000,
+                 max_distance: float = 0.3):
+        """
+        Initialize an empty local retriever
+
+        Args:
+            embed_query: Function embedding a query in the same space as the documents
+            dim: Embedding dimension
+            max_elements: Maximum number of chunks the index can hold
+            max_distance: Maximum cosine distance for a chunk to count as a local hit
+        """
+        if hnswlib is None:
+            raise ImportError("hnswlib is required for LocalRetriever")
+
+        self.embed_query = embed_query
+        self.dim = dim
+        self.max_elements = max_elements
+        self.max_distance = max_distance
+        self.documents: List[Document] = []
+
+        self.index = hnswlib.Index(space='cosine', dim=dim)
+        self.index.init_index(max_elements=max_elements, M=16, ef_construction=200)
+        self.index.set_ef(50)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @classmethod
+    def from_documents(cls,
+                       documents: List[Document],
+                       embeddings: np.ndarray,
+                       embed_query: Callable[[str], np.ndarray],
+                       **kwargs: Any) -> "LocalRetriever":
+        """
+        Build a retriever from chunked documents and their embeddings
+
+        Args:
+            documents: Chunked documents (e.g. from scrape_and_chunk)
+            embeddings: Array of shape (len(documents), dim)
+            embed_query: Function embedding a query in the same space
+            **kwargs: Extra LocalRetriever arguments
+
+        Returns:
+            Populated LocalRetriever
+        """
+        kwargs.setdefault("max_elements", max(len(documents), 1))
+        retriever = cls(embed_query, dim=embeddings.shape[1], **kwargs)
+        retriever.add_documents(documents, embeddings)
+        return retriever
+
+    def add_documents(self, documents: List[Document], embeddings: np.ndarray) -> None:
+        """
+        Add chunked documents and their embeddings to the index
+
+        Args:
+            documents: Chunked documents
+            embeddings: Array of shape (len(documents), dim)
+        """
+        if len(documents) != len(embeddings):
+            raise ValueError("Number of documents and embeddings must match")
+
+        start = len(self.documents)
+        if start + len(documents) > self.max_elements:
+            self.max_elements = start + len(documents)
+            self.index.resize_index(self.max_elements)
+
+        self.index.add_items(embeddings, np.arange(start, start + len(documents)))
+        self.documents.extend(documents)
+        logger.info(f"Indexed {len(documents)} chunks locally ({len(self.documents)} total)")
+
+    def retrieve(self, query: str, max_results: int = 5) -> Optional[List[Dict[str, Any]]]:
+        """
+        Retrieve the closest chunks for a query
+
+        Args:
+            query: The search query
+            max_results: Maximum number of results to return
+
+        Returns:
+            Bedrock-style retrieval results, or None when no chunk is close enough
+        """
+        if not self.documents:
+            return None
+
+        k = min(max_results, len(self.documents))
+        labels, distances = self.index.knn_query(self.embed_query(query), k=k)
+
+        results = []
+        for label, distance in zip(labels[0], distances[0]):
+            if distance < self.max_distance:
+                doc = self.documents[int(label)]
+                results.append({
+                    'content': {'text': doc.page_content},
+                    'metadata': dict(doc.metadata),
+                    'score': 1.0 - float(distance)
+                })
+
+        if not results:
+            return None
+
+        logger.info(f"Retrieved {len(results)} local results for query: {query[:50]}...")
+        return results
+
+    def save(self, path: str) -> None:
+        """
+        Persist the index and documents ({path}.hnsw, {path}.docs)
+
+        Args:
+            path: File prefix to save to
+        """
+        path = os.path.expanduser(path)
+        self.index.save_index(f"{path}.hnsw")
+        with open(f"{path}.docs", "wb") as f:
+            pickle.dump({"dim": self.dim, "max_distance": self.max_distance, "documents": self.documents}, f)
+
+    @classmethod
+    def load(cls, path: str, embed_query: Callable[[str], np.ndarray]) -> "LocalRetriever":
+        """
+        Load a retriever saved with save()
+
+        Args:
+            path: File prefix the retriever was saved to
+            embed_query: Function embedding a query in the same space as the documents
+
+        Returns:
+            Loaded LocalRetriever
+        """
+        path = os.path.expanduser(path)
+        with open(f"{path}.docs", "rb") as f:
+            state = pickle.load(f)
+
+        retriever = cls(embed_query, dim=state["dim"], max_elements=max(len(state["documents"]), 1),
+                        max_distance=state["max_distance"])
+        retriever.index.load_index(f"{path}.hnsw", max_elements=retriever.max_elements)
+        retriever.index.set_ef(50)
+        retriever.documents = state["documents"]
+        return retriever
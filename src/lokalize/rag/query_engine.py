@@ -1,14 +1,105 @@
 """
 AWS Bedrock Knowledge Base integration for fashion cultural RAG
 """
-import json
 import logging
-from typing import List, Dict, Any, Optional
-import boto3
+from functools import lru_cache
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+import numpy as np
 from botocore.exceptions import ClientError, BotoCoreError
 
+from .bedrock_clients import agent_client, json_dumps, json_loads, runtime_client
+from .local_retriever import LocalRetriever
+from .semantic_cache import SemanticCache
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # Optional: only needed when a SemanticCache is configured
+    SentenceTransformer = None
+
 logger = logging.getLogger(__name__)
 
+# Local embedding model for the semantic cache (avoids a remote embedding call)
+QUERY_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+@lru_cache(maxsize=1)
+def _embedding_model():
+    # Returns None (cached, so the load is tried and logged once) when unavailable
+    if SentenceTransformer is None:
+        logger.warning("Semantic cache disabled: sentence-transformers is required for semantic caching")
+        return None
+    try:
+        return SentenceTransformer(QUERY_EMBEDDING_MODEL)
+    except Exception as e:
+        logger.warning(f"Semantic cache disabled: {e}")
+        return None
+
+@lru_cache(maxsize=2048)
+def _embed(text: str) -> tuple:
+    # Tuple so the cached value is hashable and can't be mutated by callers
+    return tuple(_embedding_model().encode(text, normalize_embeddings=True).tolist())
+
+def _embed_query(text: str) -> Optional[np.ndarray]:
+    """Embed a query locally (None when no model is available); repeated queries hit the LRU cache"""
+    if _embedding_model() is None:
+        return None
+    # all-MiniLM-L6-v2 is uncased, so lowercasing only raises the hit rate
+    return np.asarray(_embed(text.strip().lower()), dtype=np.float32)
+
+# Localization guidance shared by the two-step and fused RAG prompts
+LOCALIZATION_GUIDELINES = """Based on the provided context about {target_region}'s culture and fashion norms, provide specific, actionable advice for localizing fashion marketing. Consider:
+
+1. Cultural sensitivities and values
+2. Appropriate imagery and messaging
+3. Color symbolism and preferences
+4. Religious and social considerations
+5. Local fashion trends and preferences
+6. Marketing channels and approaches
+
+Provide a comprehensive response that goes beyond translation to true cultural localization."""
+
+# Region-level instructions sent as the system prompt; invariant across queries
+# so Bedrock can reuse the cached prefix
+SYSTEM_PROMPT_TEMPLATE = """You are an expert in fashion marketing localization with deep knowledge of {target_region}'s cultural norms, values, and preferences.
+
+""" + LOCALIZATION_GUIDELINES
+
+# Bedrock models that accept cache_control prompt-caching checkpoints
+PROMPT_CACHING_MODELS = ("claude-3-5-haiku", "claude-3-7-sonnet", "claude-haiku-4",
+                         "claude-sonnet-4", "claude-opus-4")
+
+@lru_cache(maxsize=32)
+def _system_prompt(target_region: str) -> str:
+    return SYSTEM_PROMPT_TEMPLATE.format(target_region=target_region)
+
+# Static pieces of the per-query user message, joined around context and query
+USER_PROMPT_PREFIX = "\nContext Information:\n"
+USER_PROMPT_MIDDLE = "\n\nUser Query: "
+USER_PROMPT_SUFFIX = "\n\nResponse:"
+
+# Prompt for Bedrock RetrieveAndGenerate; Bedrock fills in the $...$ placeholders
+# and sends the user query as the conversation message
+FUSED_PROMPT_TEMPLATE = """
+You are an expert in fashion marketing localization with deep knowledge of {target_region}'s cultural norms, values, and preferences.
+
+Context Information:
+$search_results$
+
+""" + LOCALIZATION_GUIDELINES + """
+
+$output_format_instructions$"""
+
+@lru_cache(maxsize=32)
+def _fused_prompt(target_region: str) -> str:
+    return FUSED_PROMPT_TEMPLATE.format(target_region=target_region)
+
+def collect(chunks: Iterable[str]) -> str:
+    """Join a streamed response into the full generated text"""
+    return "".join(chunks)
+
+# Errors where the fused API is unusable (unsupported model/prompt, missing IAM
+# permission) but the separate Retrieve + InvokeModel calls may still work
+FUSED_FALLBACK_ERROR_CODES = ("ValidationException", "AccessDeniedException")
+
 class BedrockKnowledgeBase:
     """
     AWS Bedrock Knowledge Base client for fashion cultural localization
@@ -17,7 +108,10 @@ class BedrockKnowledgeBase:
     def __init__(self, 
                  region_name: str = "us-east-1",
                  knowledge_base_id: Optional[str] = None,
-                 model_id: str = "anthropic.claude-3-sonnet-20240229-v1:0"):
+                 model_id: str = "anthropic.claude-3-sonnet-20240229-v1:0",
+                 semantic_cache: Optional[SemanticCache] = None,
+                 local_retriever: Optional[LocalRetriever] = None,
+                 prompt_caching: Optional[bool] = None):
         """
         Initialize Bedrock Knowledge Base client
         
@@ -25,14 +119,23 @@ class BedrockKnowledgeBase:
             region_name: AWS region
             knowledge_base_id: Bedrock Knowledge Base ID (if existing)
             model_id: Foundation model ID for generation
+            semantic_cache: Optional cache returning stored responses for similar queries
+            local_retriever: Optional in-process index tried before the Bedrock Retrieve call
+            prompt_caching: Send cache_control checkpoints; None detects support from
+                model_id via PROMPT_CACHING_MODELS
         """
         self.region_name = region_name
         self.knowledge_base_id = knowledge_base_id
         self.model_id = model_id
+        self.semantic_cache = semantic_cache
+        self.local_retriever = local_retriever
+        if prompt_caching is None:
+            prompt_caching = any(name in model_id for name in PROMPT_CACHING_MODELS)
+        self.prompt_caching = prompt_caching
         
         try:
-            self.bedrock_agent = boto3.client('bedrock-agent-runtime', region_name=region_name)
-            self.bedrock_runtime = boto3.client('bedrock-runtime', region_name=region_name)
+            self.bedrock_agent = agent_client(region_name)
+            self.bedrock_runtime = runtime_client(region_name)
             logger.info(f"Initialized Bedrock clients for region: {region_name}")
         except Exception as e:
             logger.error(f"Failed to initialize Bedrock clients: {e}")
@@ -70,12 +173,12 @@ class BedrockKnowledgeBase:
                 }
             )
             
-            # Filter results by confidence threshold
-            filtered_results = []
-            for result in response.get('retrievalResults', []):
-                score = result.get('score', 0)
-                if score >= confidence_threshold:
-                    filtered_results.append(result)
+            # Filter results by confidence threshold (vectorized for large result sets)
+            retrieval_results = response.get('retrievalResults', [])
+            scores = np.fromiter((r.get('score', 0.0) for r in retrieval_results),
+                                 dtype=np.float64, count=len(retrieval_results))
+            keep = np.flatnonzero(scores >= confidence_threshold)
+            filtered_results = [retrieval_results[i] for i in keep]
             
             logger.info(f"Retrieved {len(filtered_results)} results for query: {query[:50]}...")
             
@@ -96,17 +199,20 @@ class BedrockKnowledgeBase:
     def generate_culturally_aware_response(self, 
                                          query: str, 
                                          context_docs: List[Dict],
-                                         target_region: str = "Saudi Arabia") -> str:
+                                         target_region: str = "Saudi Arabia") -> Iterator[str]:
         """
         Generate culturally aware fashion advice using retrieved context
         
+        Text is streamed as the model produces it; use collect() to get the
+        full response as a single string.
+        
         Args:
             query: User's fashion localization query
             context_docs: Retrieved documents from knowledge base
             target_region: Target cultural region
             
-        Returns:
-            Generated culturally aware response
+        Yields:
+            Chunks of the generated culturally aware response
         """
         # Prepare context from retrieved documents
         context_text = "\n\n".join([
@@ -115,33 +221,19 @@ class BedrockKnowledgeBase:
             for doc in context_docs
         ])
         
-        # Create prompt for cultural fashion localization
-        prompt = f"""
-You are an expert in fashion marketing localization with deep knowledge of {target_region}'s cultural norms, values, and preferences.
-
-Context Information:
-{context_text}
-
-User Query: {query}
-
-Based on the provided context about {target_region}'s culture and fashion norms, provide specific, actionable advice for localizing fashion marketing. Consider:
-
-1. Cultural sensitivities and values
-2. Appropriate imagery and messaging
-3. Color symbolism and preferences
-4. Religious and social considerations
-5. Local fashion trends and preferences
-6. Marketing channels and approaches
-
-Provide a comprehensive response that goes beyond translation to true cultural localization.
-
-Response:"""
+        # Static instructions go in the system prompt; only context and query vary
+        system_block = {"type": "text", "text": _system_prompt(target_region)}
+        if self.prompt_caching:
+            system_block["cache_control"] = {"type": "ephemeral"}
+        
+        prompt = "".join((USER_PROMPT_PREFIX, context_text, USER_PROMPT_MIDDLE, query, USER_PROMPT_SUFFIX))
 
         try:
             # Call Bedrock for generation
-            body = json.dumps({
+            body = json_dumps({
                 "anthropic_version": "bedrock-2023-05-31",
                 "max_tokens": 1000,
+                "system": [system_block],
                 "messages": [
                     {
                         "role": "user",
@@ -150,18 +242,22 @@ Response:"""
                 ]
             })
             
-            response = self.bedrock_runtime.invoke_model(
+            response = self.bedrock_runtime.invoke_model_with_response_stream(
                 body=body,
                 modelId=self.model_id,
                 accept='application/json',
                 contentType='application/json'
             )
             
-            response_body = json.loads(response.get('body').read())
-            generated_text = response_body.get('content', [{}])[0].get('text', '')
+            for event in response.get('body'):
+                chunk = json_loads(event['chunk']['bytes'])
+                if chunk.get('type') == 'content_block_delta':
+                    yield chunk['delta'].get('text', '')
+                elif chunk.get('type') == 'message_start':
+                    usage = chunk.get('message', {}).get('usage', {})
+                    logger.debug(f"Prompt cache read tokens: {usage.get('cache_read_input_tokens', 0)}")
             
             logger.info(f"Generated response for query: {query[:50]}...")
-            return generated_text
             
         except Exception as e:
             logger.error(f"Error generating response: {e}")
@@ -183,27 +279,216 @@ Response:"""
             Dictionary with generated response and metadata
         """
         try:
-            # Step 1: Retrieve relevant documents
-            retrieval_results = self.query_knowledge_base(query, max_results)
+            # Step 0: Serve semantically similar queries from the cache
+            cached = self._cached_response(query, target_region)
+            if cached is not None:
+                return cached
             
-            # Step 2: Generate culturally aware response
-            response = self.generate_culturally_aware_response(
-                query, 
-                retrieval_results['results'], 
-                target_region
-            )
+            # Step 1: Retrieve relevant documents, locally when the index has close matches
+            retrieved_docs = self._retrieve_local(query, max_results)
+            if retrieved_docs is None:
+                retrieved_docs = self.query_knowledge_base(query, max_results)['results']
             
-            return {
-                'query': query,
-                'target_region': target_region,
-                'generated_response': response,
-                'retrieved_docs': retrieval_results['results'],
-                'num_docs_used': len(retrieval_results['results'])
-            }
+            # Step 2: Generate culturally aware response
+            return self._generate_result(query, target_region, retrieved_docs)
             
         except Exception as e:
             logger.error(f"Error in query_and_generate pipeline: {e}")
             raise
+    
+    def stream_query_and_generate(self, 
+                                  query: str, 
+                                  target_region: str = "Saudi Arabia",
+                                  max_results: int = 5) -> Iterator[str]:
+        """
+        Streaming variant of query_and_generate
+        
+        Text is yielded as the model produces it. The full result is added to
+        the semantic cache once the stream has been consumed.
+        
+        Args:
+            query: User's fashion localization query
+            target_region: Target cultural region
+            max_results: Maximum number of documents to retrieve
+            
+        Yields:
+            Chunks of the generated culturally aware response
+        """
+        cached = self._cached_response(query, target_region)
+        if cached is not None:
+            yield cached['generated_response']
+            return
+        
+        retrieved_docs = self._retrieve_local(query, max_results)
+        if retrieved_docs is None:
+            retrieved_docs = self.query_knowledge_base(query, max_results)['results']
+        
+        parts = []
+        for text in self.generate_culturally_aware_response(query, retrieved_docs, target_region):
+            parts.append(text)
+            yield text
+        
+        self._cache_response(query, target_region, self._build_result(
+            query, target_region, collect(parts), retrieved_docs
+        ))
+    
+    def query_and_generate_fused(self, 
+                                query: str, 
+                                target_region: str = "Saudi Arabia",
+                                max_results: int = 5) -> Dict[str, Any]:
+        """
+        RAG pipeline in a single Bedrock RetrieveAndGenerate round trip
+        
+        Falls back to the two-step query_and_generate when the fused API
+        rejects the request. RetrieveAndGenerate has no score threshold, so
+        unlike query_and_generate low-confidence chunks are not filtered out;
+        use query_and_generate when that filter matters.
+        
+        Args:
+            query: User's fashion localization query
+            target_region: Target cultural region
+            max_results: Maximum number of documents to retrieve
+            
+        Returns:
+            Dictionary with generated response and metadata
+        """
+        if not self.knowledge_base_id:
+            raise ValueError("Knowledge Base ID not provided")
+        
+        cached = self._cached_response(query, target_region)
+        if cached is not None:
+            return cached
+        
+        # A local index hit makes server-side retrieval unnecessary
+        local_docs = self._retrieve_local(query, max_results)
+        if local_docs is not None:
+            return self._generate_result(query, target_region, local_docs)
+        
+        try:
+            response = self.bedrock_agent.retrieve_and_generate(
+                input={
+                    'text': query
+                },
+                retrieveAndGenerateConfiguration={
+                    'type': 'KNOWLEDGE_BASE',
+                    'knowledgeBaseConfiguration': {
+                        'knowledgeBaseId': self.knowledge_base_id,
+                        'modelArn': f"arn:aws:bedrock:{self.region_name}::foundation-model/{self.model_id}",
+                        'retrievalConfiguration': {
+                            'vectorSearchConfiguration': {
+                                'numberOfResults': max_results,
+                                'overrideSearchType': 'HYBRID'
+                            }
+                        },
+                        'generationConfiguration': {
+                            'promptTemplate': {
+                                'textPromptTemplate': _fused_prompt(target_region)
+                            },
+                            'inferenceConfig': {
+                                'textInferenceConfig': {
+                                    'maxTokens': 1000
+                                }
+                            }
+                        }
+                    }
+                }
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in FUSED_FALLBACK_ERROR_CODES:
+                logger.warning(f"RetrieveAndGenerate unavailable, using two-step pipeline: {e}")
+                return self.query_and_generate(query, target_region, max_results)
+            logger.error(f"AWS ClientError in fused RAG pipeline: {e}")
+            raise
+        
+        # The same chunk is cited once per generated passage it supports
+        retrieved_docs = []
+        seen = set()
+        for citation in response.get('citations', []):
+            for reference in citation.get('retrievedReferences', []):
+                key = (repr(reference.get('location')), reference.get('content', {}).get('text'))
+                if key not in seen:
+                    seen.add(key)
+                    retrieved_docs.append(reference)
+        logger.info(f"Generated fused response for query: {query[:50]}...")
+        
+        result = self._build_result(
+            query, target_region, response.get('output', {}).get('text', ''), retrieved_docs
+        )
+        
+        self._cache_response(query, target_region, result)
+        return result
+    
+    def _retrieve_local(self, query: str, max_results: int) -> Optional[List[Dict]]:
+        """
+        Retrieve from the local index, or None when absent, failing or no chunk is close enough
+        
+        The local lookup embeds the query first, so a local miss on a new query
+        costs two serial network calls (embedding, then Bedrock Retrieve);
+        repeated queries reuse the cached embedding.
+        """
+        if self.local_retriever is None:
+            return None
+        try:
+            return self.local_retriever.retrieve(query, max_results)
+        except Exception as e:
+            logger.warning(f"Local retrieval failed, falling back to Bedrock Retrieve: {e}")
+            return None
+    
+    def _generate_result(self, 
+                         query: str, 
+                         target_region: str, 
+                         retrieved_docs: List[Dict]) -> Dict[str, Any]:
+        """Generate a response from retrieved docs and cache the result"""
+        response = collect(self.generate_culturally_aware_response(
+            query, 
+            retrieved_docs, 
+            target_region
+        ))
+        
+        result = self._build_result(query, target_region, response, retrieved_docs)
+        self._cache_response(query, target_region, result)
+        return result
+    
+    @staticmethod
+    def _build_result(query: str, 
+                      target_region: str, 
+                      response: str, 
+                      retrieved_docs: List[Dict]) -> Dict[str, Any]:
+        """Assemble the result dictionary returned by the query pipelines"""
+        return {
+            'query': query,
+            'target_region': target_region,
+            'generated_response': response,
+            'retrieved_docs': retrieved_docs,
+            'num_docs_used': len(retrieved_docs)
+        }
+    
+    def _cached_response(self, query: str, target_region: str) -> Optional[Dict[str, Any]]:
+        """Look up a semantically similar query in the cache; failures count as a miss"""
+        if self.semantic_cache is None:
+            return None
+        
+        try:
+            embedding = _embed_query(query)
+            if embedding is None:
+                return None
+            cached = self.semantic_cache.lookup(embedding, namespace=target_region)
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed, treating as a miss: {e}")
+            return None
+        return dict(cached) if cached is not None else None
+    
+    def _cache_response(self, query: str, target_region: str, result: Dict[str, Any]) -> None:
+        """Store a generated result in the cache, if configured; failures are logged, not raised"""
+        if self.semantic_cache is None:
+            return
+        
+        try:
+            embedding = _embed_query(query)
+            if embedding is not None:
+                self.semantic_cache.add(embedding, result, namespace=target_region)
+        except Exception as e:
+            logger.warning(f"Failed to store response in semantic cache: {e}")
 
 # Utility function for quick testing
 def quick_fashion_query(query: str, 
@@ -224,6 +509,23 @@ def quick_fashion_query(query: str,
     result = kb.query_and_generate(query, region)
     return result['generated_response']
 
+def stream_fashion_query(query: str, 
+                         knowledge_base_id: str,
+                         region: str = "Saudi Arabia") -> Iterator[str]:
+    """
+    Streaming variant of quick_fashion_query
+    
+    Args:
+        query: Fashion localization query
+        knowledge_base_id: AWS Bedrock Knowledge Base ID
+        region: Target cultural region
+        
+    Yields:
+        Chunks of the generated culturally aware response
+    """
+    kb = BedrockKnowledgeBase(knowledge_base_id=knowledge_base_id)
+    yield from kb.stream_query_and_generate(query, region)
+
 if __name__ == "__main__":
     # Example usage (requires actual Knowledge Base ID)
     logging.basicConfig(level=logging.INFO)
@@ -0,0 +1,187 @@
+"""
+Semantic response cache for fashion cultural RAG queries
+"""
+import atexit
+import logging
+import os
+import shelve
+import threading
+from typing import Any, Dict, Optional, Set
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:  # Optional: install with `pip install lokalize[cache]`
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+class SemanticCache:
+    """
+    Cache of generated responses looked up by query embedding similarity.
+
+    Entries live in an HNSW cosine index and are scoped by namespace (e.g. the
+    target region); when full, the least frequently hit entry is evicted.
+    With a path set, changes are written on flush(), close() (also called when
+    used as a context manager) or interpreter exit, not on every add.
+    """
+
+    def __init__(self,
+                 dim: int = 384,
+                 threshold: float = 0.93,
+                 max_entries: int = 10000,
+                 path: Optional[str] = None):
+        """
+        Initialize the semantic cache
+
+        Args:
+            dim: Embedding dimension (384 for all-MiniLM-L6-v2)
+            threshold: Minimum cosine similarity for a cache hit
+            max_entries: Maximum number of cached responses before eviction
+            path: Optional file prefix to persist the cache to ({path}.hnsw, {path}.db)
+        """
+        if hnswlib is None:
+            raise ImportError("hnswlib is required for SemanticCache")
+
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.path = os.path.expanduser(path) if path else None
+
+        self.responses: Dict[int, Dict[str, Any]] = {}
+        self.namespaces: Dict[int, str] = {}
+        self.hits: Dict[int, int] = {}
+        self._namespace_counts: Dict[str, int] = {}
+        self._pending: Set[int] = set()
+        self._deleted: Set[int] = set()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        self.index = hnswlib.Index(space='cosine', dim=dim)
+        if self.path and os.path.exists(f"{self.path}.hnsw"):
+            self._load()
+        else:
+            self.index.init_index(max_elements=max_entries, M=16, ef_construction=200,
+                                  allow_replace_deleted=True)
+        self.index.set_ef(50)
+
+        if self.path:
+            atexit.register(self.flush)
+
+    def __enter__(self) -> "SemanticCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.responses)
+
+    def lookup(self, embedding: np.ndarray, namespace: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Find a cached response for a semantically similar query
+
+        Args:
+            embedding: Query embedding
+            namespace: Only match entries stored under this namespace
+
+        Returns:
+            Cached response dictionary, or None on a miss
+        """
+        with self._lock:
+            if not self._namespace_counts.get(namespace):
+                return None
+
+            try:
+                labels, distances = self.index.knn_query(
+                    embedding, k=1, filter=lambda label: self.namespaces.get(label) == namespace
+                )
+            except RuntimeError:
+                # Filtered search found no candidate within the ef budget
+                return None
+            label = int(labels[0][0])
+            similarity = 1.0 - float(distances[0][0])
+            if similarity < self.threshold:
+                return None
+
+            self.hits[label] += 1
+            logger.info(f"Semantic cache hit (similarity={similarity:.3f})")
+            return self.responses[label]
+
+    def add(self, embedding: np.ndarray, response: Dict[str, Any], namespace: str = "") -> None:
+        """
+        Store a generated response under its query embedding
+
+        Args:
+            embedding: Query embedding
+            response: Response dictionary to return on future hits
+            namespace: Namespace the entry is scoped to
+        """
+        with self._lock:
+            if len(self.responses) >= self.max_entries:
+                self._evict()
+
+            label = self._next_id
+            self._next_id += 1
+            self.index.add_items(np.asarray(embedding, dtype=np.float32).reshape(1, -1),
+                                 [label], replace_deleted=True)
+            self.responses[label] = response
+            self.namespaces[label] = namespace
+            self.hits[label] = 0
+            self._namespace_counts[namespace] = self._namespace_counts.get(namespace, 0) + 1
+            self._pending.add(label)
+            self._deleted.discard(label)
+
+    def flush(self) -> None:
+        """Write entries added or evicted since the last flush to disk"""
+        if not self.path:
+            return
+
+        with self._flush_lock:
+            with self._lock:
+                pending = {label: (self.namespaces[label], self.responses[label])
+                           for label in self._pending if label in self.responses}
+                deleted = self._deleted
+                self._pending, self._deleted = set(), set()
+                if not pending and not deleted:
+                    return
+                # hnswlib does not support saving concurrently with add_items
+                self.index.save_index(f"{self.path}.hnsw")
+
+            with shelve.open(f"{self.path}.db") as shelf:
+                for label in deleted:
+                    shelf.pop(str(label), None)
+                for label, entry in pending.items():
+                    shelf[str(label)] = entry
+
+    def close(self) -> None:
+        """Flush pending changes to disk and drop the exit hook"""
+        self.flush()
+        if self.path:
+            atexit.unregister(self.flush)
+
+    def _evict(self) -> None:
+        """Evict the least frequently used entry (LFU beats LRU for query caches)"""
+        label = min(self.hits, key=self.hits.get)
+        self.index.mark_deleted(label)
+        del self.responses[label]
+        namespace = self.namespaces.pop(label)
+        del self.hits[label]
+        self._namespace_counts[namespace] -= 1
+        self._pending.discard(label)
+        self._deleted.add(label)
+
+    def _load(self) -> None:
+        """Load a previously persisted index and its responses"""
+        self.index.load_index(f"{self.path}.hnsw", max_elements=self.max_entries,
+                              allow_replace_deleted=True)
+        with shelve.open(f"{self.path}.db") as shelf:
+            for key, (namespace, response) in shelf.items():
+                self.responses[int(key)] = response
+                self.namespaces[int(key)] = namespace
+                self.hits[int(key)] = 0
+                self._namespace_counts[namespace] = self._namespace_counts.get(namespace, 0) + 1
+
+        self._next_id = max(self.responses, default=-1) + 1
+        logger.info(f"Loaded {len(self.responses)} cached responses from {self.path}")
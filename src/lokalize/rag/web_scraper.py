@@ -1,25 +1,251 @@
 """
 Web scraper for fashion cultural content using LangChain WebBaseLoader
 """
+import asyncio
+import importlib.util
 import logging
-from typing import List, Optional
+import os
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional
+import numpy as np
+import requests
+from bs4 import BeautifulSoup, SoupStrainer
 from langchain_community.document_loaders import WebBaseLoader
+from langchain_community.document_loaders.web_base import default_header_template
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 
+from .bedrock_clients import json_dumps, json_loads, runtime_client
+
+try:
+    import httpx
+except ImportError:  # Optional: fall back to WebBaseLoader's sequential fetching
+    httpx = None
+
+try:
+    from semantic_text_splitter import TextSplitter
+except ImportError:  # Optional: LangChain's pure-Python splitter is used instead
+    TextSplitter = None
+
+try:
+    from transformers import AutoTokenizer
+except ImportError:  # Optional: only needed with tokenize_chunks=True
+    AutoTokenizer = None
+
+try:
+    import diskcache
+except ImportError:  # Optional: scraped chunks are not persisted between runs
+    diskcache = None
+
 logger = logging.getLogger(__name__)
 
+# httpx only negotiates HTTP/2 when the h2 package is installed
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") is not None else "html.parser"
+
+# Only build the DOM for content-bearing tags (plus title/meta for metadata),
+# so navigation, scripts and images never reach the chunker or embedder
+CONTENT_STRAINER = SoupStrainer(
+    ["title", "meta", "article", "main", "p", "h1", "h2", "h3", "h4", "h5", "h6", "li"]
+)
+GET_TEXT_KWARGS = {"separator": " ", "strip": True}
+
+# <html lang=...> is outside the strained tags, so read it from the raw markup
+HTML_LANG_PATTERN = re.compile(r"<html[^>]*\blang=[\"']?([\w-]+)", re.IGNORECASE)
+
+# Reuse WebBaseLoader's browser-like headers; Connection is hop-by-hop and invalid over HTTP/2
+REQUEST_HEADERS = {k: v for k, v in default_header_template.items() if k != "Connection"}
+
+# Bedrock embedding model that accepts batched input (Titan embeds one text per call)
+DOCUMENT_EMBEDDING_MODEL = "cohere.embed-multilingual-v3"
+EMBEDDING_BATCH_SIZE = 96  # Cohere's per-request text limit
+
+# Tokenizer matching the Claude generation model, for pre-tokenized chunks
+CHUNK_TOKENIZER = "Xenova/claude-tokenizer"
+
+DEFAULT_CACHE_DIR = "~/.cache/lokalize/scrape"
+CACHE_EXPIRE_SECONDS = 86400 * 7
+# Pages without ETag/Last-Modified cannot be revalidated, so keep them briefly
+UNVALIDATED_EXPIRE_SECONDS = 3600
+
+
+def _validator(headers) -> str:
+    """Pick the HTTP cache validator for a response ('' when the server sends none)"""
+    return headers.get("ETag") or headers.get("Last-Modified") or ""
+
+
+def _build_metadata(soup: BeautifulSoup, url: str, markup: str = "") -> dict:
+    """Build document metadata the same way LangChain's WebBaseLoader does"""
+    metadata = {"source": url}
+    title = soup.find("title")
+    if title:
+        metadata["title"] = title.get_text()
+    description = soup.find("meta", attrs={"name": "description"})
+    if description:
+        metadata["description"] = description.get("content", "No description found.")
+    html = soup.find("html")
+    if html:
+        metadata["language"] = html.get("lang", "No language found.")
+    elif markup:
+        lang = HTML_LANG_PATTERN.search(markup, 0, 4096)
+        metadata["language"] = lang.group(1) if lang else "No language found."
+    return metadata
+
+
+async def _fetch_all(urls: List[str], max_concurrency: int = 5) -> List[Document]:
+    """
+    Fetch URLs concurrently, bounded by a semaphore
+    
+    Args:
+        urls: List of URLs to fetch
+        max_concurrency: Maximum number of in-flight requests
+        
+    Returns:
+        List of Document objects, one per successfully fetched URL
+    """
+    sem = asyncio.Semaphore(max_concurrency)
+    
+    async with httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE, timeout=10, headers=REQUEST_HEADERS, follow_redirects=True
+    ) as client:
+        async def fetch(url: str) -> Document:
+            async with sem:
+                resp = await client.get(url)
+            resp.raise_for_status()
+            soup = BeautifulSoup(resp.text, HTML_PARSER, parse_only=CONTENT_STRAINER)
+            return Document(
+                page_content=soup.get_text(**GET_TEXT_KWARGS),
+                metadata=_build_metadata(soup, url, resp.text)
+            )
+        
+        results = await asyncio.gather(*(fetch(url) for url in urls), return_exceptions=True)
+    
+    documents = []
+    for url, result in zip(urls, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Failed to fetch {url}: {result}")
+        else:
+            documents.append(result)
+    return documents
+
+
+async def _head_all(urls: List[str], max_concurrency: int = 5) -> Dict[str, Optional[str]]:
+    """
+    Issue concurrent HEAD requests to collect ETag/Last-Modified validators
+    
+    Args:
+        urls: List of URLs to check
+        max_concurrency: Maximum number of in-flight requests
+        
+    Returns:
+        Mapping of URL to validator, or None when the HEAD request failed
+    """
+    sem = asyncio.Semaphore(max_concurrency)
+    
+    async with httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE, timeout=10, headers=REQUEST_HEADERS, follow_redirects=True
+    ) as client:
+        async def head(url: str) -> str:
+            async with sem:
+                resp = await client.head(url)
+            resp.raise_for_status()
+            return _validator(resp.headers)
+        
+        results = await asyncio.gather(*(head(url) for url in urls), return_exceptions=True)
+    
+    return {
+        url: None if isinstance(result, Exception) else result
+        for url, result in zip(urls, results)
+    }
+
+
+# Splitters are stateless, so instances with the same settings share them
+@lru_cache(maxsize=16)
+def _get_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+    )
+
+
+@lru_cache(maxsize=16)
+def _get_fast_splitter(chunk_size: int, chunk_overlap: int):
+    # Rust-backed splitter with the same character-based chunk limits
+    if TextSplitter is None:
+        return None
+    return TextSplitter(capacity=chunk_size, overlap=chunk_overlap)
+
+
+def _invoke_embedding(texts: List[str], input_type: str, model_id: str, region_name: str) -> List[np.ndarray]:
+    """Embed up to EMBEDDING_BATCH_SIZE texts in one Bedrock request"""
+    response = runtime_client(region_name).invoke_model(
+        modelId=model_id,
+        body=json_dumps({
+            "texts": texts,
+            "input_type": input_type,
+            "truncate": "END"
+        }),
+        accept='application/json',
+        contentType='application/json'
+    )
+    response_body = json_loads(response.get('body').read())
+    return [np.asarray(e, dtype=np.float32) for e in response_body['embeddings']]
+
+
+@lru_cache(maxsize=2048)
+def _cached_query_embedding(query: str, model_id: str, region_name: str) -> tuple:
+    # Hot queries skip the remote embedding call entirely
+    return tuple(_invoke_embedding([query], "search_query", model_id, region_name)[0].tolist())
+
+
+@lru_cache(maxsize=8)
+def _open_cache(directory: str):
+    # One Cache per directory, opened on first use rather than per scraper
+    return diskcache.Cache(directory)
+
+
+@lru_cache(maxsize=1)
+def _chunk_tokenizer():
+    # Returns None (cached, so the load is tried and logged once) when unavailable
+    if AutoTokenizer is None:
+        logger.warning("Skipping chunk tokenization: transformers is required for tokenize_chunks")
+        return None
+    try:
+        return AutoTokenizer.from_pretrained(CHUNK_TOKENIZER)
+    except Exception as e:
+        logger.warning(f"Skipping chunk tokenization: {e}")
+        return None
+
+
 class FashionCulturalScraper:
     """Scraper for fashion and cultural content from web sources"""
     
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self,
+                 chunk_size: int = 1000,
+                 chunk_overlap: int = 200,
+                 max_concurrency: int = 5,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 tokenize_chunks: bool = False):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-        )
+        self.max_concurrency = max_concurrency
+        # Store token_ids/n_tokens in chunk metadata so consumers need not re-tokenize
+        self.tokenize_chunks = tokenize_chunks
+        self.text_splitter = _get_splitter(chunk_size, chunk_overlap)
+        self._fast_splitter = _get_fast_splitter(chunk_size, chunk_overlap)
+        
+        # Pass cache_dir=None to disable the on-disk chunk cache
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+    
+    @property
+    def cache(self):
+        """On-disk chunk cache, or None when disabled or diskcache is missing"""
+        if diskcache is None or self.cache_dir is None:
+            return None
+        return _open_cache(self.cache_dir)
     
     def scrape_urls(self, urls: List[str]) -> List[Document]:
         """
@@ -32,14 +258,59 @@ class FashionCulturalScraper:
             List of Document objects with scraped content
         """
         try:
-            loader = WebBaseLoader(urls)
-            documents = loader.load()
+            if httpx is not None and not self._in_event_loop():
+                documents = asyncio.run(_fetch_all(urls, self.max_concurrency))
+            else:
+                loader = WebBaseLoader(
+                    urls,
+                    default_parser=HTML_PARSER,
+                    bs_kwargs={"parse_only": CONTENT_STRAINER},
+                    bs_get_text_kwargs=GET_TEXT_KWARGS
+                )
+                documents = loader.load()
             logger.info(f"Successfully loaded {len(documents)} documents from {len(urls)} URLs")
             return documents
         except Exception as e:
             logger.error(f"Error scraping URLs: {e}")
             return []
     
+    @staticmethod
+    def _in_event_loop() -> bool:
+        """asyncio.run() cannot be nested inside an already running loop"""
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+    
+    def fetch_validators(self, urls: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Get the ETag/Last-Modified validator for each URL via HEAD requests
+        
+        Args:
+            urls: List of URLs to check
+            
+        Returns:
+            Mapping of URL to validator, or None when the URL could not be checked
+        """
+        if httpx is not None and not self._in_event_loop():
+            return asyncio.run(_head_all(urls, self.max_concurrency))
+        
+        validators = {}
+        for url in urls:
+            try:
+                resp = requests.head(url, headers=REQUEST_HEADERS, timeout=10, allow_redirects=True)
+                resp.raise_for_status()
+                validators[url] = _validator(resp.headers)
+            except Exception as e:
+                logger.warning(f"HEAD request failed for {url}: {e}")
+                validators[url] = None
+        return validators
+    
+    def _cache_key(self, url: str, validator: str) -> tuple:
+        """Cache key; chunk settings are included so reconfiguring invalidates entries"""
+        return (url, validator, self.chunk_size, self.chunk_overlap, self.tokenize_chunks)
+    
     def chunk_documents(self, documents: List[Document]) -> List[Document]:
         """
         Split documents into smaller chunks for better RAG performance
@@ -51,12 +322,84 @@ class FashionCulturalScraper:
             List of chunked documents
         """
         try:
-            chunked_docs = self.text_splitter.split_documents(documents)
+            if self._fast_splitter is not None:
+                chunked_docs = [
+                    Document(page_content=chunk, metadata=dict(doc.metadata))
+                    for doc in documents
+                    for chunk in self._fast_splitter.chunks(doc.page_content)
+                ]
+            else:
+                chunked_docs = self.text_splitter.split_documents(documents)
             logger.info(f"Split {len(documents)} documents into {len(chunked_docs)} chunks")
-            return chunked_docs
         except Exception as e:
             logger.error(f"Error chunking documents: {e}")
             return documents
+        
+        if self.tokenize_chunks and chunked_docs:
+            self._add_token_ids(chunked_docs)
+        return chunked_docs
+    
+    def _add_token_ids(self, chunks: List[Document]) -> None:
+        """Tokenize chunks once, in a single batch, and store the ids in metadata"""
+        tokenizer = _chunk_tokenizer()
+        if tokenizer is None:
+            return
+        
+        try:
+            encoded = tokenizer(
+                [chunk.page_content for chunk in chunks], add_special_tokens=False
+            )
+        except Exception as e:
+            logger.warning(f"Skipping chunk tokenization: {e}")
+            return
+        
+        for chunk, token_ids in zip(chunks, encoded["input_ids"]):
+            chunk.metadata["token_ids"] = token_ids
+            chunk.metadata["n_tokens"] = len(token_ids)
+    
+    def embed_documents(self,
+                        docs: List[Document],
+                        batch_size: int = EMBEDDING_BATCH_SIZE,
+                        model_id: str = DOCUMENT_EMBEDDING_MODEL,
+                        region_name: str = "us-east-1") -> np.ndarray:
+        """
+        Embed document chunks in batches via Bedrock
+        
+        Args:
+            docs: List of documents to embed
+            batch_size: Number of texts per embedding request
+            model_id: Bedrock embedding model ID
+            region_name: AWS region for Bedrock
+            
+        Returns:
+            Array of shape (len(docs), dim) with one embedding per document
+        """
+        embeddings = []
+        for i in range(0, len(docs), batch_size):
+            batch = docs[i:i + batch_size]
+            embeddings.extend(_invoke_embedding(
+                [doc.page_content for doc in batch], "search_document", model_id, region_name
+            ))
+        
+        logger.info(f"Embedded {len(docs)} chunks in {-(-len(docs) // batch_size)} requests")
+        return np.stack(embeddings) if embeddings else np.empty((0, 0), dtype=np.float32)
+    
+    def embed_query(self,
+                    query: str,
+                    model_id: str = DOCUMENT_EMBEDDING_MODEL,
+                    region_name: str = "us-east-1") -> np.ndarray:
+        """
+        Embed a search query in the same space as embed_documents
+        
+        Args:
+            query: Search query
+            model_id: Bedrock embedding model ID
+            region_name: AWS region for Bedrock
+            
+        Returns:
+            Query embedding
+        """
+        return np.asarray(_cached_query_embedding(query, model_id, region_name), dtype=np.float32)
     
     def scrape_and_chunk(self, urls: List[str]) -> List[Document]:
         """
@@ -68,11 +411,43 @@ class FashionCulturalScraper:
         Returns:
             List of chunked documents ready for embedding
         """
-        documents = self.scrape_urls(urls)
-        if not documents:
-            return []
+        cache = self.cache
+        if cache is None:
+            documents = self.scrape_urls(urls)
+            if not documents:
+                return []
+            
+            return self.chunk_documents(documents)
+        
+        validators = self.fetch_validators(urls)
+        chunks_by_url = {}
+        for url in urls:
+            # Unreachable URLs are always refetched rather than served stale
+            if validators[url] is not None:
+                cached = cache.get(self._cache_key(url, validators[url]))
+                if cached is not None:
+                    chunks_by_url[url] = cached
+        
+        misses = [url for url in urls if url not in chunks_by_url]
+        logger.info(f"Scrape cache: {len(chunks_by_url)} hits, {len(misses)} misses")
+        
+        if misses:
+            documents = self.scrape_urls(misses)
+            fresh_chunks = defaultdict(list)
+            for chunk in self.chunk_documents(documents) if documents else []:
+                fresh_chunks[chunk.metadata.get("source")].append(chunk)
+            
+            for url in misses:
+                if url in fresh_chunks:
+                    chunks_by_url[url] = fresh_chunks[url]
+                    if validators[url] is not None:
+                        cache.set(
+                            self._cache_key(url, validators[url]),
+                            fresh_chunks[url],
+                            expire=CACHE_EXPIRE_SECONDS if validators[url] else UNVALIDATED_EXPIRE_SECONDS
+                        )
         
-        return self.chunk_documents(documents)
+        return [chunk for url in urls for chunk in chunks_by_url.get(url, [])]
 
 # Predefined URLs for Saudi Arabian fashion and cultural content
 SAUDI_FASHION_URLS = [
@@ -9,6 +9,21 @@ import os
 # Add src to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+@pytest.fixture(autouse=True)
+def clear_bedrock_clients():
+    """Keep cached Bedrock clients (real or mocked) from leaking between tests"""
+    try:
+        from lokalize.rag import bedrock_clients
+    except ImportError:
+        yield
+        return
+
+    bedrock_clients.agent_client.cache_clear()
+    bedrock_clients.runtime_client.cache_clear()
+    yield
+    bedrock_clients.agent_client.cache_clear()
+    bedrock_clients.runtime_client.cache_clear()
+
 def test_import_structure():
     """Test that all modules can be imported"""
     try:
@@ -23,9 +38,11 @@ def test_scraper_initialization():
     """Test scraper can be initialized"""
     try:
         from lokalize.rag.web_scraper import FashionCulturalScraper
-        scraper = FashionCulturalScraper(chunk_size=500, chunk_overlap=50)
+        scraper = FashionCulturalScraper(chunk_size=500, chunk_overlap=50, cache_dir=None)
         assert scraper.chunk_size == 500
         assert scraper.chunk_overlap == 50
+        other = FashionCulturalScraper(chunk_size=500, chunk_overlap=50, cache_dir=None)
+        assert other.text_splitter is scraper.text_splitter
     except ImportError:
         pytest.skip("LangChain dependencies not available")
 
@@ -45,6 +62,22 @@ def test_bedrock_initialization():
     except ImportError:
         pytest.skip("Boto3 dependencies not available")
 
+def test_bedrock_clients_shared_across_instances():
+    """Test Bedrock clients are created once per region"""
+    try:
+        from lokalize.rag import query_engine
+    except ImportError:
+        pytest.skip("Boto3 dependencies not available")
+
+    with patch('boto3.client') as mock_boto3:
+        first = query_engine.BedrockKnowledgeBase(knowledge_base_id="kb-1")
+        second = query_engine.BedrockKnowledgeBase(knowledge_base_id="kb-2")
+        query_engine.BedrockKnowledgeBase(knowledge_base_id="kb-1", region_name="eu-west-1")
+
+    assert first.bedrock_agent is second.bedrock_agent
+    assert mock_boto3.call_count == 4
+    assert mock_boto3.call_args.kwargs['config'].max_pool_connections == 50
+
 def test_sample_urls_exist():
     """Test that sample URLs are defined"""
     try:
@@ -55,6 +88,444 @@ def test_sample_urls_exist():
     except ImportError:
         pytest.skip("Module not available")
 
+def test_scrape_urls_concurrent_fetch():
+    """Test async scraping builds documents and skips failed URLs"""
+    try:
+        import httpx
+        from lokalize.rag import web_scraper
+    except ImportError:
+        pytest.skip("httpx or LangChain dependencies not available")
+
+    def handler(request):
+        if request.url.path == "/missing":
+            return httpx.Response(404)
+        html = ("<html lang='ar'><head><title>Riyadh</title><script>track()</script></head>"
+                "<body><nav>Menu</nav><p>Modest fashion</p></body></html>")
+        return httpx.Response(200, text=html)
+
+    real_client = httpx.AsyncClient
+    def mock_client(**kwargs):
+        kwargs.pop("http2", None)
+        return real_client(transport=httpx.MockTransport(handler), **kwargs)
+
+    with patch.object(web_scraper.httpx, "AsyncClient", mock_client):
+        scraper = web_scraper.FashionCulturalScraper(cache_dir=None)
+        docs = scraper.scrape_urls(["https://example.com/ok", "https://example.com/missing"])
+
+    assert len(docs) == 1
+    assert "Modest fashion" in docs[0].page_content
+    assert docs[0].metadata["source"] == "https://example.com/ok"
+    assert docs[0].metadata["title"] == "Riyadh"
+    assert docs[0].metadata["language"] == "ar"
+    assert "Menu" not in docs[0].page_content and "track" not in docs[0].page_content
+
+def test_chunk_documents_respects_size_and_metadata():
+    """Test chunking keeps chunks within size and preserves source metadata"""
+    try:
+        from langchain.schema import Document
+        from lokalize.rag.web_scraper import FashionCulturalScraper
+    except ImportError:
+        pytest.skip("LangChain dependencies not available")
+
+    scraper = FashionCulturalScraper(chunk_size=100, chunk_overlap=20, cache_dir=None)
+    doc = Document(page_content="Modest fashion in Riyadh. " * 40, metadata={"source": "https://example.com"})
+    chunks = scraper.chunk_documents([doc])
+
+    assert len(chunks) > 1
+    assert all(len(c.page_content) <= 100 for c in chunks)
+    assert all(c.metadata == {"source": "https://example.com"} for c in chunks)
+
+def test_chunk_documents_stores_token_ids():
+    """Test chunks are tokenized once with ids kept in metadata"""
+    try:
+        from langchain.schema import Document
+        from lokalize.rag import web_scraper
+    except ImportError:
+        pytest.skip("LangChain dependencies not available")
+
+    tokenizer = Mock(side_effect=lambda texts, **kwargs: {"input_ids": [[1, 2, 3] for _ in texts]})
+    scraper = web_scraper.FashionCulturalScraper(chunk_size=100, chunk_overlap=20,
+                                                 cache_dir=None, tokenize_chunks=True)
+    doc = Document(page_content="Modest fashion in Riyadh. " * 10, metadata={"source": "https://example.com"})
+    with patch.object(web_scraper, '_chunk_tokenizer', return_value=tokenizer):
+        chunks = scraper.chunk_documents([doc])
+
+    assert tokenizer.call_count == 1
+    assert all(c.metadata["token_ids"] == [1, 2, 3] and c.metadata["n_tokens"] == 3 for c in chunks)
+
+def test_chunk_tokenizer_failure_is_remembered():
+    """Test a tokenizer that fails to load is not retried on every chunking call"""
+    try:
+        from langchain.schema import Document
+        from lokalize.rag import web_scraper
+    except ImportError:
+        pytest.skip("LangChain dependencies not available")
+
+    auto_tokenizer = Mock()
+    auto_tokenizer.from_pretrained.side_effect = OSError("offline")
+    scraper = web_scraper.FashionCulturalScraper(chunk_size=100, chunk_overlap=20,
+                                                 cache_dir=None, tokenize_chunks=True)
+    doc = Document(page_content="Modest fashion in Riyadh. " * 10, metadata={"source": "https://example.com"})
+    web_scraper._chunk_tokenizer.cache_clear()
+    with patch.object(web_scraper, 'AutoTokenizer', auto_tokenizer):
+        scraper.chunk_documents([doc])
+        chunks = scraper.chunk_documents([doc])
+    web_scraper._chunk_tokenizer.cache_clear()
+
+    assert auto_tokenizer.from_pretrained.call_count == 1
+    assert all("token_ids" not in c.metadata for c in chunks)
+
+def test_scrape_and_chunk_uses_disk_cache(tmp_path):
+    """Test unchanged URLs are served from the scrape cache on repeat runs"""
+    try:
+        import time
+        import diskcache
+        from langchain.schema import Document
+        from lokalize.rag import web_scraper
+    except ImportError:
+        pytest.skip("diskcache or LangChain dependencies not available")
+
+    url = "https://example.com/page"
+    scraper = web_scraper.FashionCulturalScraper(chunk_size=500, chunk_overlap=50, cache_dir=str(tmp_path))
+    scraper.fetch_validators = Mock(return_value={url: '"etag-1"'})
+    scraper.scrape_urls = Mock(return_value=[
+        Document(page_content="Modest fashion " * 10, metadata={"source": url})
+    ])
+
+    first = scraper.scrape_and_chunk([url])
+    second = scraper.scrape_and_chunk([url])
+    assert scraper.scrape_urls.call_count == 1
+    assert [d.page_content for d in second] == [d.page_content for d in first]
+
+    # A changed ETag must miss the cache
+    scraper.fetch_validators.return_value = {url: '"etag-2"'}
+    scraper.scrape_and_chunk([url])
+    assert scraper.scrape_urls.call_count == 2
+
+    # Pages without a validator are only cached briefly
+    scraper.fetch_validators.return_value = {url: ""}
+    scraper.scrape_and_chunk([url])
+    _, expire_time = scraper.cache.get(scraper._cache_key(url, ""), expire_time=True)
+    assert expire_time - time.time() <= web_scraper.UNVALIDATED_EXPIRE_SECONDS
+
+def test_embed_documents_batches_requests():
+    """Test chunks are embedded in batched Bedrock calls"""
+    try:
+        import io
+        import json
+        from langchain.schema import Document
+        from lokalize.rag.web_scraper import FashionCulturalScraper
+    except ImportError:
+        pytest.skip("LangChain dependencies not available")
+
+    def invoke_model(**kwargs):
+        texts = json.loads(kwargs['body'])['texts']
+        body = json.dumps({"embeddings": [[float(len(t)), 1.0] for t in texts]})
+        return {'body': io.BytesIO(body.encode())}
+
+    docs = [Document(page_content="x" * (i + 1)) for i in range(5)]
+    with patch('boto3.client') as mock_boto3:
+        mock_boto3.return_value.invoke_model.side_effect = invoke_model
+        scraper = FashionCulturalScraper(cache_dir=None)
+        embeddings = scraper.embed_documents(docs, batch_size=2)
+
+    assert mock_boto3.return_value.invoke_model.call_count == 3
+    assert embeddings.shape == (5, 2)
+    assert embeddings[4][0] == 5.0
+
+def test_semantic_cache_lookup_and_eviction(tmp_path):
+    """Test semantic cache hits on similar embeddings and evicts LFU entries"""
+    try:
+        import numpy as np
+        from lokalize.rag.semantic_cache import SemanticCache
+        cache = SemanticCache(dim=4, threshold=0.9, max_entries=2, path=str(tmp_path / "cache"))
+    except ImportError:
+        pytest.skip("hnswlib not available")
+
+    cache.add(np.array([1.0, 0.0, 0.0, 0.0]), {"generated_response": "a"})
+    cache.add(np.array([0.0, 1.0, 0.0, 0.0]), {"generated_response": "b"})
+    assert cache.lookup(np.array([0.99, 0.05, 0.0, 0.0]))["generated_response"] == "a"
+    assert cache.lookup(np.array([0.0, 0.0, 1.0, 0.0])) is None
+
+    # "b" has never been hit, so it is evicted first
+    cache.add(np.array([0.0, 0.0, 1.0, 0.0]), {"generated_response": "c"})
+    assert cache.lookup(np.array([0.0, 1.0, 0.0, 0.0])) is None
+
+    # Nothing is written until the cache is flushed
+    assert not (tmp_path / "cache.hnsw").exists()
+    cache.close()
+
+    reloaded = SemanticCache(dim=4, threshold=0.9, max_entries=2, path=str(tmp_path / "cache"))
+    assert len(reloaded) == 2
+    assert reloaded.lookup(np.array([0.0, 0.0, 1.0, 0.0]))["generated_response"] == "c"
+
+    # The owning RAG system flushes the cache when closed
+    from lokalize.rag import FashionLocalizationRAG
+    with patch('boto3.client'):
+        with FashionLocalizationRAG(knowledge_base_id="test-kb-id", semantic_cache=reloaded):
+            reloaded.add(np.array([1.0, 0.0, 0.0, 0.0]), {"generated_response": "d"})
+    assert SemanticCache(dim=4, threshold=0.9, max_entries=2,
+                         path=str(tmp_path / "cache")).lookup(np.array([1.0, 0.0, 0.0, 0.0]))["generated_response"] == "d"
+
+def test_query_and_generate_semantic_cache_hit():
+    """Test cached responses skip retrieval and generation"""
+    try:
+        import numpy as np
+        from lokalize.rag import query_engine
+        from lokalize.rag.semantic_cache import SemanticCache
+        cache = SemanticCache(dim=4)
+    except ImportError:
+        pytest.skip("hnswlib or Boto3 dependencies not available")
+
+    with patch('boto3.client'):
+        kb = query_engine.BedrockKnowledgeBase(knowledge_base_id="test-kb-id", semantic_cache=cache)
+    kb.query_knowledge_base = Mock(return_value={'results': []})
+    kb.generate_culturally_aware_response = Mock(return_value=["Use modest ", "imagery"])
+
+    with patch.object(query_engine, '_embed_query', return_value=np.array([1.0, 0.0, 0.0, 0.0])):
+        first = kb.query_and_generate("Handbag campaign")
+        second = kb.query_and_generate("Handbag campaign")
+        other_region = kb.query_and_generate("Handbag campaign", target_region="Japan")
+
+    assert second['generated_response'] == first['generated_response']
+    assert other_region['target_region'] == "Japan"
+    assert kb.generate_culturally_aware_response.call_count == 2
+
+def test_semantic_cache_without_sentence_transformers():
+    """Test a missing query embedding model degrades to cache misses"""
+    try:
+        from lokalize.rag import query_engine
+        from lokalize.rag.semantic_cache import SemanticCache
+        cache = SemanticCache(dim=4)
+    except ImportError:
+        pytest.skip("hnswlib or Boto3 dependencies not available")
+
+    with patch('boto3.client'):
+        kb = query_engine.BedrockKnowledgeBase(knowledge_base_id="test-kb-id", semantic_cache=cache)
+    kb.query_knowledge_base = Mock(return_value={'results': []})
+    kb.generate_culturally_aware_response = Mock(return_value=["Use modest imagery"])
+
+    query_engine._embedding_model.cache_clear()
+    with patch.object(query_engine, 'SentenceTransformer', None):
+        first = kb.query_and_generate("Handbag campaign")
+        kb.query_and_generate("Handbag campaign")
+    query_engine._embedding_model.cache_clear()
+
+    assert first['generated_response'] == "Use modest imagery"
+    assert kb.generate_culturally_aware_response.call_count == 2
+    assert len(cache) == 0
+
+def test_query_knowledge_base_confidence_filter():
+    """Test retrieval results below the confidence threshold are dropped"""
+    try:
+        from lokalize.rag.query_engine import BedrockKnowledgeBase
+    except ImportError:
+        pytest.skip("Boto3 dependencies not available")
+
+    with patch('boto3.client'):
+        kb = BedrockKnowledgeBase(knowledge_base_id="test-kb-id")
+    kb.bedrock_agent = Mock()
+    kb.bedrock_agent.retrieve.return_value = {'retrievalResults': [
+        {'score': 0.9, 'content': {'text': 'a'}},
+        {'score': 0.5, 'content': {'text': 'b'}},
+        {'content': {'text': 'no score'}},
+        {'score': 0.7, 'content': {'text': 'c'}},
+    ]}
+
+    result = kb.query_knowledge_base("Handbag campaign", confidence_threshold=0.7)
+    assert [r['content']['text'] for r in result['results']] == ['a', 'c']
+    assert result['total_results'] == 2
+
+def test_query_embedding_lru_cache():
+    """Test normalized repeat queries reuse the cached embedding"""
+    try:
+        import numpy as np
+        from lokalize.rag import query_engine
+    except ImportError:
+        pytest.skip("Boto3 dependencies not available")
+
+    model = Mock()
+    model.encode.return_value = np.array([0.6, 0.8])
+    query_engine._embed.cache_clear()
+    with patch.object(query_engine, '_embedding_model', return_value=model):
+        first = query_engine._embed_query("Modest fashion ")
+        second = query_engine._embed_query("modest FASHION")
+    query_engine._embed.cache_clear()
+
+    assert model.encode.call_count == 1
+    assert np.array_equal(first, second)
+
+def test_generate_response_streams_text():
+    """Test generation yields streamed text deltas"""
+    try:
+        import json
+        from lokalize.rag.query_engine import BedrockKnowledgeBase, collect
+    except ImportError:
+        pytest.skip("Boto3 dependencies not available")
+
+    events = [
+        {"type": "message_start", "message": {"usage": {"input_tokens": 10}}},
+        {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "Modest "}},
+        {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "elegance"}},
+        {"type": "message_stop"},
+    ]
+    with patch('boto3.client'):
+        kb = BedrockKnowledgeBase(knowledge_base_id="test-kb-id")
+    kb.bedrock_runtime = Mock()
+    kb.bedrock_runtime.invoke_model_with_response_stream.return_value = {
+        'body': [{'chunk': {'bytes': json.dumps(e).encode()}} for e in events]
+    }
+
+    stream = kb.generate_culturally_aware_response("Handbag campaign", [])
+    assert next(stream) == "Modest "
+    assert collect(stream) == "elegance"
+
+    body = json.loads(kb.bedrock_runtime.invoke_model_with_response_stream.call_args.kwargs['body'])
+    assert "Saudi Arabia" in body['system'][0]['text']
+    assert "Handbag campaign" in body['messages'][0]['content']
+
+def test_stream_query_and_generate_caches_full_response():
+    """Test the streaming pipeline yields deltas and caches the joined text"""
+    try:
+        from lokalize.rag.query_engine import BedrockKnowledgeBase
+    except ImportError:
+        pytest.skip("Boto3 dependencies not available")
+
+    with patch('boto3.client'):
+        kb = BedrockKnowledgeBase(knowledge_base_id="test-kb-id")
+    kb.query_knowledge_base = Mock(return_value={'results': [{'content': {'text': "doc"}}]})
+    kb.generate_culturally_aware_response = Mock(return_value=iter(["Modest ", "elegance"]))
+    kb._cache_response = Mock()
+
+    assert list(kb.stream_query_and_generate("Handbag campaign")) == ["Modest ", "elegance"]
+    result = kb._cache_response.call_args.args[2]
+    assert result['generated_response'] == "Modest elegance"
+    assert result['num_docs_used'] == 1
+
+def test_prompt_caching_only_for_supported_models():
+    """Test cache_control is only sent to models that support prompt caching"""
+    try:
+        from lokalize.rag.query_engine import BedrockKnowledgeBase
+    except ImportError:
+        pytest.skip("Boto3 dependencies not available")
+
+    with patch('boto3.client'):
+        default_kb = BedrockKnowledgeBase(knowledge_base_id="test-kb-id")
+        caching_kb = BedrockKnowledgeBase(
+            knowledge_base_id="test-kb-id",
+            model_id="anthropic.claude-3-7-sonnet-20250219-v1:0"
+        )
+        haiku_kb = BedrockKnowledgeBase(
+            knowledge_base_id="test-kb-id",
+            model_id="anthropic.claude-haiku-4-5-20251001-v1:0"
+        )
+        override_kb = BedrockKnowledgeBase(knowledge_base_id="test-kb-id", prompt_caching=True)
+    assert not default_kb.prompt_caching
+    assert caching_kb.prompt_caching
+    assert haiku_kb.prompt_caching
+    assert override_kb.prompt_caching
+
+def test_query_and_generate_fused_with_fallback():
+    """Test fused RetrieveAndGenerate and fallback to the two-step pipeline"""
+    try:
+        from botocore.exceptions import ClientError
+        from lokalize.rag.query_engine import BedrockKnowledgeBase
+    except ImportError:
+        pytest.skip("Boto3 dependencies not available")
+
+    with patch('boto3.client'):
+        kb = BedrockKnowledgeBase(knowledge_base_id="test-kb-id")
+    kb.bedrock_agent = Mock()
+    kb.bedrock_agent.retrieve_and_generate.return_value = {
+        'output': {'text': "Emphasize modest elegance"},
+        'citations': [
+            {'retrievedReferences': [{'content': {'text': "doc"}, 'location': {'s3Location': {'uri': "a"}}}]},
+            {'retrievedReferences': [{'content': {'text': "doc"}, 'location': {'s3Location': {'uri': "a"}}},
+                                     {'content': {'text': "other"}, 'location': {'s3Location': {'uri': "b"}}}]}
+        ]
+    }
+
+    result = kb.query_and_generate_fused("Handbag campaign")
+    config = kb.bedrock_agent.retrieve_and_generate.call_args.kwargs['retrieveAndGenerateConfiguration']
+    template = config['knowledgeBaseConfiguration']['generationConfiguration']['promptTemplate']['textPromptTemplate']
+    assert "$search_results$" in template and "Saudi Arabia" in template
+    assert result['generated_response'] == "Emphasize modest elegance"
+    assert result['num_docs_used'] == 2
+
+    kb.bedrock_agent.retrieve_and_generate.side_effect = ClientError(
+        {'Error': {'Code': 'ValidationException', 'Message': 'unsupported'}}, 'RetrieveAndGenerate'
+    )
+    kb.query_and_generate = Mock(return_value={'generated_response': "two-step"})
+    assert kb.query_and_generate_fused("Handbag campaign")['generated_response'] == "two-step"
+
+def test_local_retriever_serves_hot_queries(tmp_path):
+    """Test close local matches skip Bedrock Retrieve and misses fall through"""
+    try:
+        import numpy as np
+        from langchain.schema import Document
+        from lokalize.rag.local_retriever import LocalRetriever
+        from lokalize.rag.query_engine import BedrockKnowledgeBase
+    except ImportError:
+        pytest.skip("hnswlib or LangChain dependencies not available")
+
+    query_vectors = {"abaya styling": np.array([1.0, 0.0, 0.0]), "unrelated": np.array([0.0, 0.0, 1.0])}
+    docs = [Document(page_content="Abaya trends", metadata={"source": "https://example.com/a"}),
+            Document(page_content="Riyadh fashion week", metadata={"source": "https://example.com/b"})]
+    retriever = LocalRetriever.from_documents(
+        docs, np.array([[0.98, 0.2, 0.0], [0.0, 1.0, 0.0]], dtype=np.float32), query_vectors.get
+    )
+
+    local = retriever.retrieve("abaya styling", max_results=2)
+    assert [r['content']['text'] for r in local] == ["Abaya trends"]
+    assert local[0]['metadata']['source'] == "https://example.com/a"
+    assert retriever.retrieve("unrelated") is None
+
+    retriever.save(str(tmp_path / "index"))
+    assert len(LocalRetriever.load(str(tmp_path / "index"), query_vectors.get)) == 2
+
+    with patch('boto3.client'):
+        kb = BedrockKnowledgeBase(knowledge_base_id="test-kb-id", local_retriever=retriever)
+    kb.query_knowledge_base = Mock(return_value={'results': []})
+    kb.generate_culturally_aware_response = Mock(return_value=["advice"])
+
+    assert kb.query_and_generate("abaya styling")['num_docs_used'] == 1
+    assert kb.query_knowledge_base.call_count == 0
+    kb.query_and_generate("unrelated")
+    assert kb.query_knowledge_base.call_count == 1
+
+    # A failing local lookup (e.g. embedding error) falls through to Bedrock
+    kb.local_retriever = Mock()
+    kb.local_retriever.retrieve.side_effect = RuntimeError("embedding unavailable")
+    kb.query_and_generate("abaya styling")
+    assert kb.query_knowledge_base.call_count == 2
+
+def test_build_local_retriever_attaches_to_query_engine(tmp_path):
+    """Test scraped chunks are embedded, indexed, saved and attached to the query engine"""
+    try:
+        import numpy as np
+        from langchain.schema import Document
+        from lokalize.rag import FashionLocalizationRAG, LocalRetriever
+    except ImportError:
+        pytest.skip("hnswlib or LangChain dependencies not available")
+
+    with patch('boto3.client'):
+        rag = FashionLocalizationRAG(knowledge_base_id="test-kb-id", aws_region="eu-west-1")
+    docs = [Document(page_content="Abaya trends", metadata={"source": "https://example.com/a"}),
+            Document(page_content="Riyadh fashion week", metadata={"source": "https://example.com/b"})]
+    rag.scraper.embed_documents = Mock(return_value=np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32))
+    rag.scraper.embed_query = Mock(return_value=np.array([1.0, 0.0], dtype=np.float32))
+
+    retriever = rag.build_local_retriever(docs, path=str(tmp_path / "index"))
+
+    assert rag.query_engine.local_retriever is retriever
+    assert rag.scraper.embed_documents.call_args.kwargs['region_name'] == "eu-west-1"
+    assert retriever.retrieve("abaya")[0]['content']['text'] == "Abaya trends"
+    assert rag.scraper.embed_query.call_args.kwargs['region_name'] == "eu-west-1"
+    assert len(LocalRetriever.load(str(tmp_path / "index"), rag.scraper.embed_query)) == 2
+
+    with pytest.raises(ValueError):
+        rag.build_local_retriever([])
+
 def test_localization_request_model():
     """Test localization request structure"""
     try:
@@ -71,9 +542,53 @@ def test_localization_request_model():
         assert request.target_region == "Saudi Arabia"
         assert request.brand_context == "Luxury fashion"
         assert request.product_type == "Handbags"
+        
+        with pytest.raises(AttributeError):
+            request.query = "Changed"
+    except ImportError:
+        pytest.skip("Module not available")
+
+def test_localization_advice_batch_preserves_order():
+    """Test batch advice runs every request and keeps input order"""
+    try:
+        from lokalize.rag import FashionLocalizationRAG, LocalizationRequest
+    except ImportError:
+        pytest.skip("Module not available")
+
+    rag = FashionLocalizationRAG()
+    rag.query_engine = Mock()
+    rag.query_engine.query_and_generate_fused.side_effect = lambda query, region: {
+        'generated_response': f"advice for {query.split(' | ')[0]}",
+        'num_docs_used': 1
+    }
+
+    requests = [LocalizationRequest(query=f"q{i}") for i in range(5)]
+    responses = rag.get_localization_advice_batch(requests, max_workers=3)
+
+    assert [r.advice for r in responses] == [f"advice for q{i}" for i in range(5)]
+    assert rag.get_localization_advice_batch([]) == []
+
+    # The two-step pipeline keeps the retrieval confidence threshold
+    rag.use_fused_pipeline = False
+    rag.query_engine.query_and_generate.return_value = {'generated_response': "two-step"}
+    assert rag.get_localization_advice(requests[0]).advice == "two-step"
+
+def test_parse_response_keyword_scan():
+    """Test response parsing detects keywords case-insensitively"""
+    try:
+        from lokalize.rag import FashionLocalizationRAG, LocalizationRequest
     except ImportError:
         pytest.skip("Module not available")
 
+    rag = FashionLocalizationRAG()
+    request = LocalizationRequest(query="Test query")
+
+    both = rag._parse_response(request, {'generated_response': "CULTURAL norms matter. We Recommend modesty."})
+    assert both.cultural_insights and both.recommendations
+
+    neither = rag._parse_response(request, {'generated_response': "Use muted colors."})
+    assert neither.cultural_insights == [] and neither.recommendations == []
+
 def test_demo_functions_exist():
     """Test that demo functions are available"""
     try: